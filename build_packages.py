@@ -2,11 +2,122 @@
 """Build packages using CMake"""
 
 import argparse
+import os
+import shutil
+import signal
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
+output_lock = threading.Lock()
+
+# Piped commands currently running, so a failing build can stop the rest
+process_lock = threading.Lock()
+running_processes = set()
+stop_event = threading.Event()
+
+
+def terminate_process_tree(process):
+    """Terminate a piped command together with the build tools it spawned."""
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def stop_running_commands():
+    """Refuse to start new piped commands and terminate those in flight."""
+    with process_lock:
+        stop_event.set()
+        for process in running_processes:
+            terminate_process_tree(process)
+
+
+def log(message):
+    """Print a whole message at once, never interleaved with other threads' output."""
+    with output_lock:
+        print(message, flush=True)
+
+
+def run_command(cmd, env, prefix=None, stoppable=True):
+    """Run a command and return its exit code.
+
+    With a prefix, stdout/stderr are read line by line through a pipe and
+    every line is tagged so output of concurrent builds stays readable.
+    A command started with stoppable=False is never terminated by
+    stop_running_commands() and always runs to completion.
+    """
+    if prefix is None:
+        return subprocess.run(cmd, env=env, stdin=subprocess.DEVNULL).returncode
+
+    with process_lock:
+        if stop_event.is_set():
+            return 1
+        process = subprocess.Popen(
+            cmd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            # Own process group so ninja and compilers can be stopped too
+            start_new_session=(os.name != "nt")
+        )
+        if stoppable:
+            running_processes.add(process)
+
+    try:
+        for line in process.stdout:
+            with output_lock:
+                sys.stdout.write(f"[{prefix}] {line}")
+                # stdout is block-buffered when piped (CI); show lines as they come
+                sys.stdout.flush()
+        process.stdout.close()
+        return process.wait()
+    except BaseException:
+        # e.g. Ctrl+C while reading: the command's own process group never
+        # sees the SIGINT, so stop it before it is forgotten below
+        if stoppable:
+            terminate_process_tree(process)
+        raise
+    finally:
+        with process_lock:
+            running_processes.discard(process)
+
+
+def read_cmake_cache(cache_file):
+    """Return the NAME -> VALUE entries of a CMakeCache.txt."""
+    entries = {}
+    with open(cache_file, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith(("#", "//")):
+                continue
+            name_and_type, separator, value = line.rstrip("\n").partition("=")
+            if separator:
+                entries[name_and_type.partition(":")[0]] = value
+    return entries
+
+
+def is_configured(build_dir, expected_cache_entries):
+    """Whether build_dir was generated by an earlier configure with the same settings."""
+    if not (build_dir / "build.ninja").is_file():
+        return False
+    # Opening the cache doubles as its existence check
+    try:
+        cache = read_cmake_cache(build_dir / "CMakeCache.txt")
+    except OSError:
+        return False
+    return all(cache.get(name) == value for name, value in expected_cache_entries.items())
+
+
 def main():
     parser = argparse.ArgumentParser(description="Build packages using CMake")
     parser.add_argument("--cmake", required=True, help="Path to CMakeLists.txt directory")
@@ -17,110 +128,237 @@ def main():
     parser.add_argument("--package", action="append", default=[], help="Package to build (can be specified multiple times)")
     parser.add_argument("--environment", action="append", default=[], help="Environment variable to set (format: VAR=set:VALUE, VAR=append:VALUE, VAR=prepend:VALUE)")
     parser.add_argument("--stage", default="BUILD_ENGINE_STAGE", help="Build stage (default: BUILD_ENGINE_STAGE)")
+    parser.add_argument("--reuse_configure", action="store_true", help="Skip configure for build directories already configured with the same preset/stage/build_type; CMake still re-runs on CMakeLists changes, but remote packages are not re-synced")
+    parser.add_argument("--link_jobs", type=int, default=0, help="Maximum concurrent link jobs per build via a Ninja job pool (default: 0, unlimited)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of preset/build_type combinations to build concurrently (default: 1). With more than 1, later combinations are configured before earlier ones are installed, so they cannot find_package() each other's installs")
+    parser.add_argument("--sync_jobs", type=int, default=None, help="Maximum number of remote packages cloned concurrently during configure (default: keep the cached value, initially 8; 1 clones serially)")
 
     args = parser.parse_args()
 
     cmake_dir = Path(args.cmake).resolve()
     base_build_dir = Path(args.build_dir).resolve() if args.build_dir else (cmake_dir / "build")
-    presets = args.preset if args.preset else ["default"]
-    build_types = args.build_type if args.build_type else ["Release"]
-    packages = args.package
+    # Drop repeated values (keeping command-line order) so a combination is
+    # never built twice, let alone concurrently into the same build dir
+    presets = list(dict.fromkeys(args.preset)) if args.preset else ["default"]
+    build_types = list(dict.fromkeys(args.build_type)) if args.build_type else ["Release"]
+    packages = list(dict.fromkeys(args.package))
     stage = args.stage
     install = args.install
+    jobs = args.jobs
+    reuse_configure = args.reuse_configure
+    link_jobs = args.link_jobs
+    sync_jobs = args.sync_jobs
 
     packages_str = ";".join(packages) if packages else ""
 
 
     # Prepare environment variables with set, append, prepend support
-    import os
     env = os.environ.copy()
     for env_arg in args.environment:
-        if '=append:' in env_arg:
-            k, v = env_arg.split('=append:', 1)
+        # Single pass: VAR=<operation>:VALUE
+        k, _, spec = env_arg.partition('=')
+        operation, separator, v = spec.partition(':')
+        if not k or not separator:
+            print(f"Ignoring malformed environment argument: {env_arg}")
+        elif operation == 'append':
             env[k] = env.get(k, '') + v
-        elif '=prepend:' in env_arg:
-            k, v = env_arg.split('=prepend:', 1)
+        elif operation == 'prepend':
             env[k] = v + env.get(k, '')
-        elif '=set:' in env_arg:
-            k, v = env_arg.split('=set:', 1)
+        elif operation == 'set':
             env[k] = v
+        else:
+            print(f"Ignoring unknown environment operation '{operation}' in: {env_arg}")
 
-    for preset in presets:
-        for build_type in build_types:
-            build_dir = base_build_dir / f"{stage}" / f"{preset}" / f"{build_type}"
-            build_dir.mkdir(parents=True, exist_ok=True)
+    # Look cmake up once, on the PATH the builds will actually run with
+    cmake = shutil.which("cmake", path=env.get("PATH"))
+    if cmake is None:
+        print("cmake not found in PATH")
+        return 1
 
-            print(f"\n=== Configuring: preset={preset}, build_type={build_type}, packages={packages_str}, stage={stage} ===")
+    combinations = [(preset, build_type) for preset in presets for build_type in build_types]
+    # No point in more workers than combinations; a single worker runs inline.
+    workers = max(1, min(jobs, len(combinations)))
+    # Concurrent builds split the CPUs instead of each ninja using them all
+    build_parallel = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
 
-            configure_cmd = [
-                "cmake",
-                "-G", "Ninja",
-                "-S", str(cmake_dir),
-                "-B", str(build_dir)
-            ]
+    # Banner fragments are rendered once rather than per message
+    labels = {(preset, build_type): f"preset={preset}, build_type={build_type}" for preset, build_type in combinations}
+    stage_label = f"stage={stage}"
+    packages_label = f"packages={packages_str}, {stage_label}"
+
+    # Every combination has its own build directory, so builds may overlap.
+    # Installs share CMAKE_INSTALL_PREFIX and are serialized.
+    install_lock = threading.Lock()
+
+    def configure(preset, build_type, build_dir, update_packages=True):
+        label = labels[(preset, build_type)]
+        prefix = f"{preset}/{build_type}" if workers > 1 else None
+        build_dir.mkdir(parents=True, exist_ok=True)
 
+        expected_cache_entries = {
+            "ARIEO_BUILD_CONFIGURE_PRESET": preset,
+            "ARIEO_BUILD_CONFIGURE_STAGE": stage,
+            "ARIEO_LINK_JOBS": str(link_jobs),
+            "ARIEO_PACKAGES_UPDATE": "ON" if update_packages else "OFF",
+        }
+        if stage != "INSTALL_BUILD_ENV_STAGE":
+            expected_cache_entries["CMAKE_BUILD_TYPE"] = build_type
+
+        if reuse_configure and is_configured(build_dir, expected_cache_entries):
+            log(f"\n=== Reusing configure: {label}, {packages_label} ===")
+            if workers == 1:
+                return 0
+            # A pending CMake re-run would otherwise happen inside the
+            # concurrent build and sync package sources while others compile
+            returncode = run_command([cmake, "--build", str(build_dir), "--target", "build.ninja"], env, prefix)
+            if returncode != 0:
+                log(f"Configure failed for {label}, {stage_label}")
+            return returncode
+
+        log(f"\n=== Configuring: {label}, {packages_label} ===")
+
+        configure_cmd = [
+            cmake,
+            "-G", "Ninja",
+            "-S", str(cmake_dir),
+            "-B", str(build_dir)
+        ]
+
+        configure_cmd += [
+            f"-DARIEO_BUILD_CONFIGURE_PRESET={preset}",
+            f"-DARIEO_BUILD_CONFIGURE_STAGE={stage}",
+            f"-DARIEO_LINK_JOBS={link_jobs}",
+            f"-DARIEO_PACKAGES_UPDATE={expected_cache_entries['ARIEO_PACKAGES_UPDATE']}",
+        ]
+
+        if sync_jobs is not None:
+            configure_cmd.append(f"-DARIEO_PACKAGES_SYNC_JOBS={sync_jobs}")
+
+        # Nobody reads developer warnings in CI; skip emitting them
+        if env.get("CI", "").lower() in ("1", "true", "yes"):
+            configure_cmd.append("-Wno-dev")
+
+        if stage == "INSTALL_BUILD_ENV_STAGE":
+            configure_cmd += [
+            ]
+        else:
             configure_cmd += [
-                f"-DARIEO_BUILD_CONFIGURE_PRESET={preset}",
-                f"-DARIEO_BUILD_CONFIGURE_STAGE={stage}",
+                f"--preset={preset}",
+                f"-DCMAKE_BUILD_TYPE={build_type}",
             ]
 
-            if stage == "INSTALL_BUILD_ENV_STAGE":
-                configure_cmd += [
-                ]
-            else:
-                configure_cmd += [
-                    f"--preset={preset}",
-                    f"-DCMAKE_BUILD_TYPE={build_type}",
-                ]
+        # if(base_install_dir):
+        #     configure_cmd += [
+        #         f"-DCMAKE_INSTALL_PREFIX={base_install_dir}"
+        #     ]
 
-            # if(base_install_dir):
-            #     configure_cmd += [
-            #         f"-DCMAKE_INSTALL_PREFIX={base_install_dir}"
-            #     ]
+        returncode = run_command(configure_cmd, env, prefix)
+        if returncode != 0:
+            log(f"Configure failed for {label}, {stage_label}")
+        return returncode
 
-            result = subprocess.run(configure_cmd, env=env, stdin=subprocess.DEVNULL)
-            if result.returncode != 0:
-                print(f"Configure failed for preset={preset}, build_type={build_type}, stage={stage}")
-                return result.returncode
+    def build_and_install(preset, build_type, build_dir):
+        label = labels[(preset, build_type)]
+        prefix = f"{preset}/{build_type}" if workers > 1 else None
+        if stop_event.is_set():
+            return 1
 
-            print(f"\n=== Building: preset={preset}, build_type={build_type}, packages={packages_str}, stage={stage} ===")
+        log(f"\n=== Building: {label}, {packages_label} ===")
 
-            # Build
-            build_cmd = [
-                "cmake",
-                "--build", str(build_dir),
-                "--config", build_type
-            ]
+        # Build
+        build_cmd = [
+            cmake,
+            "--build", str(build_dir),
+            "--config", build_type
+        ]
+
+        # if stage == "INSTALL_BUILD_ENV_STAGE":
+        #     build_cmd += [
+        #     ]
+        # else:
+        #     build_cmd += [
+        #         f"--preset={preset}"
+        #     ]
+
+        if build_parallel:
+            build_cmd += ["--parallel", str(build_parallel)]
+
+        # Add all packages as a single --target argument (space-separated)
+        if packages:
+            build_cmd.extend(["--target"] + packages)
+
+        returncode = run_command(build_cmd, env, prefix)
+        if returncode != 0:
+            log(f"Build {'stopped' if stop_event.is_set() else 'failed'} for {label}, {stage_label}")
+            return returncode
 
-            # if stage == "INSTALL_BUILD_ENV_STAGE":
-            #     build_cmd += [
-            #     ]
-            # else:
-            #     build_cmd += [
-            #         f"--preset={preset}"
-            #     ]
-
-            # Add all packages as a single --target argument (space-separated)
-            if packages:
-                build_cmd.extend(["--target"] + packages)
-
-            result = subprocess.run(build_cmd, env=env, stdin=subprocess.DEVNULL)
-            if result.returncode != 0:
-                print(f"Build failed for preset={preset}, build_type={build_type}, stage={stage}")
-                return result.returncode
-
-            if(install):
-                print(f"\n=== Installing: preset={preset}, build_type={build_type}, stage={stage} ===")
+        if(install):
+            with install_lock:
+                log(f"\n=== Installing: {label}, {stage_label} ===")
                 install_cmd = [
-                    "cmake",
+                    cmake,
                     "--install", str(build_dir),
                     "--config", build_type
                 ]
 
-                result = subprocess.run(install_cmd, env=env, stdin=subprocess.DEVNULL)
-                if result.returncode != 0:
-                    print(f"Install failed for preset={preset}, build_type={build_type}, stage={stage}")
-                    return result.returncode
+                # Killing an install would leave the shared prefix half-written
+                returncode = run_command(install_cmd, env, prefix, stoppable=False)
+                if returncode != 0:
+                    log(f"Install {'stopped' if stop_event.is_set() else 'failed'} for {label}, {stage_label}")
+                    return returncode
+
+        return 0
+
+    build_dirs = {
+        (preset, build_type): base_build_dir / f"{stage}" / f"{preset}" / f"{build_type}"
+        for preset, build_type in combinations
+    }
+
+    if workers == 1:
+        # Configure, build and install one combination before the next, so a
+        # later configure can find_package() what an earlier one installed.
+        for preset, build_type in combinations:
+            build_dir = build_dirs[(preset, build_type)]
+            returncode = configure(preset, build_type, build_dir)
+            if returncode == 0:
+                returncode = build_and_install(preset, build_type, build_dir)
+            if returncode != 0:
+                return returncode
+    else:
+        # Configure syncs remote package sources into shared folders, so it
+        # stays serial; each build is queued as soon as its configure is
+        # done and overlaps the configures that follow. Only the first
+        # configure, which runs before any build, updates existing checkouts;
+        # later ones must not pull into sources a running build compiles.
+        def stop_remaining(futures):
+            log("Stopping remaining builds")
+            for pending in futures:
+                pending.cancel()
+            stop_running_commands()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            try:
+                for preset, build_type in combinations:
+                    if any(future.done() and future.result() != 0 for future in futures):
+                        break  # a build already failed, reported below
+                    build_dir = build_dirs[(preset, build_type)]
+                    returncode = configure(preset, build_type, build_dir, update_packages=not futures)
+                    if returncode != 0:
+                        stop_remaining(futures)
+                        return returncode
+                    futures.append(executor.submit(build_and_install, preset, build_type, build_dir))
+
+                for future in as_completed(futures):
+                    returncode = future.result()
+                    if returncode != 0:
+                        # Fail fast: drop queued combinations and stop running ones
+                        stop_remaining(futures)
+                        return returncode
+            except KeyboardInterrupt:
+                # Piped commands run in their own process group and miss Ctrl+C
+                stop_remaining(futures)
+                raise
 
     print("\n=== All builds completed successfully ===")
     return 0
@@ -50,6 +50,15 @@ function(ARIEO_WORKSPACE)
     set(CMAKE_INSTALL_PREFIX $ENV{ARIEO_PACKAGES_INSTALL_DIR} CACHE PATH "Installation directory for Arieo packages" FORCE)
 
     project(ArieoWorkspace)
+
+    # Optionally throttle link steps (memory heavy) with a Ninja job pool
+    set(ARIEO_LINK_JOBS 0 CACHE STRING "Maximum concurrent link jobs for Ninja builds (0 = unlimited)")
+    if(ARIEO_LINK_JOBS GREATER 0)
+        message(STATUS "[arieo_workspace] Limiting concurrent link jobs to ${ARIEO_LINK_JOBS}")
+        set_property(GLOBAL APPEND PROPERTY JOB_POOLS arieo_link_pool=${ARIEO_LINK_JOBS})
+        set(CMAKE_JOB_POOL_LINK arieo_link_pool)
+    endif()
+
     if(DEFINED ARGUMENT_STAGES)
         message(STATUS "[arieo_workspace] Processing stages: ${ARGUMENT_STAGES}")
         add_stages("${ARGUMENT_STAGES}")
@@ -155,20 +164,19 @@ function(add_stage_packages package_links)
     # Also build base_url→full_url map to detect tag conflicts later.
     # base_url = URL with @tag stripped (e.g. https://github.com/.../Repo.git)
     set(all_paths "")
-    set(seen_urls "")
+    set(all_path_hashes "")
+    set(remote_urls "")
+    set(remote_paths "")
     set(tag_conflict_errors "")
     set(dup_url_errors "")
     foreach(package_link IN LISTS package_links)
         parsing_pakage_link_string("${package_link}" type url local_path)
 
+        split_package_url("${url}" base_url pkg_tag pkg_name)
+
         # If no local path was provided, derive it from the URL:
         # $ENV{ARIEO_PACKAGES_DEFAULT_REMOTE_SOURCE_DIR}/<PackageName>-<Tag>
         if(NOT local_path)
-            string(REGEX REPLACE "@[^@/]+$" "" base_url_for_name "${url}")
-            string(REGEX MATCH "[^/]+$" pkg_name "${base_url_for_name}")
-            string(REGEX REPLACE "\\.git$" "" pkg_name "${pkg_name}")
-            string(REGEX MATCH "@([^@/]+)$" tag_match "${url}")
-            set(pkg_tag "${CMAKE_MATCH_1}")
             if(NOT pkg_tag)
                 message(FATAL_ERROR "[arieo_workspace] Cannot derive local path for '${url}': no @tag specified. Either add a tag (e.g. @main) or provide an explicit path with '=>'.")
             endif()
@@ -176,8 +184,6 @@ function(add_stage_packages package_links)
             message(STATUS "[arieo_workspace] No path specified for ${url}, derived: ${local_path}")
         endif()
 
-        # Strip @tag to get base URL for conflict detection
-        string(REGEX REPLACE "@[^@/]+$" "" base_url "${url}")
         string(MD5 base_hash "${base_url}")
 
         get_property(existing_url GLOBAL PROPERTY "ARIEO_PKG_BASEURL_${base_hash}")
@@ -192,19 +198,30 @@ function(add_stage_packages package_links)
             set_property(GLOBAL PROPERTY "ARIEO_PKG_BASEURL_${base_hash}" "${url}")
         endif()
 
-        # Detect duplicate URLs within this stage
-        if(url IN_LIST seen_urls)
+        # Detect duplicate URLs within this stage (property lookup, not IN_LIST)
+        string(MD5 url_hash "${url}")
+        get_property(url_seen GLOBAL PROPERTY "ARIEO_PKG_PATH_${url_hash}" SET)
+        if(url_seen)
             string(APPEND dup_url_errors "  DUPLICATE URL in stage: ${url}\n")
-        else()
-            list(APPEND seen_urls "${url}")
         endif()
 
-        string(MD5 url_hash "${url}")
+        # Hash each path once; later phases key their properties by it
+        string(MD5 path_hash "${local_path}")
         set_property(GLOBAL PROPERTY "ARIEO_PKG_PATH_${url_hash}" "${local_path}")
+        set_property(GLOBAL PROPERTY "ARIEO_PKG_PATH_HASH_${url_hash}" "${path_hash}")
         list(APPEND all_paths "${local_path}")
+        list(APPEND all_path_hashes "${path_hash}")
+
+        # Topological sort state: in-degree and dependents (filled in Phase 2),
+        # DAG level (longest dependency chain below the package, set in Phase 3)
+        set_property(GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${path_hash}" 0)
+        set_property(GLOBAL PROPERTY "ARIEO_TOPO_LEVEL_${path_hash}" 0)
+        set_property(GLOBAL PROPERTY "ARIEO_TOPO_DEPENDENTS_${path_hash}" "")
+        set_property(GLOBAL PROPERTY "ARIEO_TOPO_DEPENDENT_HASHES_${path_hash}" "")
 
         if(type STREQUAL "REMOTE")
-            sync_remote_package("${url}" "${local_path}")
+            list(APPEND remote_urls "${url}")
+            list(APPEND remote_paths "${local_path}")
         endif()
     endforeach()
 
@@ -216,18 +233,25 @@ function(add_stage_packages package_links)
         message(FATAL_ERROR "[arieo_workspace] Tag conflict(s) in stage package list:\n${tag_conflict_errors}")
     endif()
 
-    # ── Phase 2: read DEPENDS, validate tags, store dep lists ────────────────
+    # Sync remotes only once the package list is known to be valid
+    if(remote_urls)
+        sync_remote_packages("${remote_urls}" "${remote_paths}")
+    endif()
+
+    # ── Phase 2: read DEPENDS, validate tags, record dependency edges ────────
+    # Every dep-URL of A that resolves to a stage package is an edge:
+    # A.in-degree++ and A is recorded as a dependent of that package, so the
+    # BFS below only visits real edges instead of rescanning every package.
     set(dep_tag_conflict_errors "")
     set(dep_missing_errors "")
-    foreach(path IN LISTS all_paths)
+    foreach(path path_hash IN ZIP_LISTS all_paths all_path_hashes)
         get_package_info("${path}" deps)
-        string(MD5 path_hash "${path}")
         set_property(GLOBAL PROPERTY "ARIEO_PKG_DEPS_${path_hash}" "${deps}")
         message(STATUS "[arieo_workspace] ${path} depends on: ${deps}")
 
         foreach(dep_url IN LISTS deps)
             # Check if this dep references a known base URL with a different tag
-            string(REGEX REPLACE "@[^@/]+$" "" dep_base_url "${dep_url}")
+            split_package_url("${dep_url}" dep_base_url dep_tag dep_name)
             string(MD5 dep_base_hash "${dep_base_url}")
             get_property(registered_url GLOBAL PROPERTY "ARIEO_PKG_BASEURL_${dep_base_hash}")
             if(registered_url AND NOT registered_url STREQUAL dep_url)
@@ -236,7 +260,15 @@ function(add_stage_packages package_links)
                     "    dep URL          : ${dep_url}\n"
                     "    registered as    : ${registered_url}\n"
                 )
-            elseif(NOT registered_url)
+            elseif(registered_url)
+                string(MD5 dep_url_hash "${dep_url}")
+                get_property(dep_h GLOBAL PROPERTY "ARIEO_PKG_PATH_HASH_${dep_url_hash}")
+                get_property(cur_indeg GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${path_hash}")
+                math(EXPR new_indeg "${cur_indeg} + 1")
+                set_property(GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${path_hash}" ${new_indeg})
+                set_property(GLOBAL APPEND PROPERTY "ARIEO_TOPO_DEPENDENTS_${dep_h}" "${path}")
+                set_property(GLOBAL APPEND PROPERTY "ARIEO_TOPO_DEPENDENT_HASHES_${dep_h}" "${path_hash}")
+            else()
                 string(APPEND dep_missing_errors
                     "  MISSING DEPENDS in ${path}:\n"
                     "    dep URL : ${dep_url}\n"
@@ -257,60 +289,45 @@ function(add_stage_packages package_links)
     endif()
 
     # ── Phase 3: Kahn's topological sort ─────────────────────────────────────
-    # Init in-degree = 0 for every package
-    foreach(path IN LISTS all_paths)
-        string(MD5 h "${path}")
-        set_property(GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}" 0)
-    endforeach()
-
-    # For each package A: for each dep-URL of A that resolves to a known path → A.in-degree++
-    foreach(path IN LISTS all_paths)
-        string(MD5 h "${path}")
-        get_property(deps GLOBAL PROPERTY "ARIEO_PKG_DEPS_${h}")
-        foreach(dep_url IN LISTS deps)
-            string(MD5 dep_url_hash "${dep_url}")
-            get_property(dep_path GLOBAL PROPERTY "ARIEO_PKG_PATH_${dep_url_hash}")
-            if(dep_path)
-                get_property(cur_indeg GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}")
-                math(EXPR new_indeg "${cur_indeg} + 1")
-                set_property(GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}" ${new_indeg})
-            endif()
-        endforeach()
-    endforeach()
-
-    # Seed queue with all zero-in-degree packages
-    set(queue "")
-    foreach(path IN LISTS all_paths)
-        string(MD5 h "${path}")
+    # Seed queue with all zero-in-degree packages. sorted_paths doubles as the
+    # queue: queue_head indexes the next entry to visit, so nothing is popped
+    # (POP_FRONT rewrites the whole list string on every call).
+    set(sorted_paths "")
+    set(sorted_hashes "")
+    foreach(path h IN ZIP_LISTS all_paths all_path_hashes)
         get_property(indeg GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}")
         if(indeg EQUAL 0)
-            list(APPEND queue "${path}")
+            list(APPEND sorted_paths "${path}")
+            list(APPEND sorted_hashes "${h}")
         endif()
     endforeach()
 
-    # BFS: pop a package, append to sorted list, decrement dependents' in-degrees
-    set(sorted_paths "")
-    while(queue)
-        list(POP_FRONT queue cur_path)
-        list(APPEND sorted_paths "${cur_path}")
-
-        # Find every package that lists cur_path as a dependency and decrement it
-        foreach(path IN LISTS all_paths)
-            string(MD5 h "${path}")
-            get_property(deps GLOBAL PROPERTY "ARIEO_PKG_DEPS_${h}")
-            foreach(dep_url IN LISTS deps)
-                string(MD5 dep_url_hash "${dep_url}")
-                get_property(dep_path GLOBAL PROPERTY "ARIEO_PKG_PATH_${dep_url_hash}")
-                if(dep_path STREQUAL cur_path)
-                    get_property(cur_indeg GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}")
-                    math(EXPR new_indeg "${cur_indeg} - 1")
-                    set_property(GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}" ${new_indeg})
-                    if(new_indeg EQUAL 0)
-                        list(APPEND queue "${path}")
-                    endif()
-                    break()  # count each dependency edge only once
-                endif()
-            endforeach()
+    # BFS: visit the next queued package, decrement dependents' in-degrees
+    set(queue_head 0)
+    list(LENGTH sorted_paths queue_tail)
+    while(queue_head LESS queue_tail)
+        list(GET sorted_hashes ${queue_head} cur_h)
+        math(EXPR queue_head "${queue_head} + 1")
+        get_property(cur_level GLOBAL PROPERTY "ARIEO_TOPO_LEVEL_${cur_h}")
+        math(EXPR dependent_level "${cur_level} + 1")
+
+        # Decrement every package that depends on it (one entry per edge)
+        get_property(dependents GLOBAL PROPERTY "ARIEO_TOPO_DEPENDENTS_${cur_h}")
+        get_property(dependent_hashes GLOBAL PROPERTY "ARIEO_TOPO_DEPENDENT_HASHES_${cur_h}")
+        foreach(path h IN ZIP_LISTS dependents dependent_hashes)
+            # Packages on the same level do not depend on each other
+            get_property(level GLOBAL PROPERTY "ARIEO_TOPO_LEVEL_${h}")
+            if(dependent_level GREATER level)
+                set_property(GLOBAL PROPERTY "ARIEO_TOPO_LEVEL_${h}" ${dependent_level})
+            endif()
+            get_property(cur_indeg GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}")
+            math(EXPR new_indeg "${cur_indeg} - 1")
+            set_property(GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}" ${new_indeg})
+            if(new_indeg EQUAL 0)
+                list(APPEND sorted_paths "${path}")
+                list(APPEND sorted_hashes "${h}")
+                math(EXPR queue_tail "${queue_tail} + 1")
+            endif()
         endforeach()
     endwhile()
 
@@ -320,10 +337,9 @@ function(add_stage_packages package_links)
     if(NOT sorted_count EQUAL total_count)
         set(cycle_msg "[arieo_workspace] Circular dependency detected!\n")
         string(APPEND cycle_msg "  Packages involved in cycle(s):\n")
-        foreach(path IN LISTS all_paths)
+        foreach(path h IN ZIP_LISTS all_paths all_path_hashes)
             list(FIND sorted_paths "${path}" found_idx)
             if(found_idx EQUAL -1)
-                string(MD5 h "${path}")
                 get_property(remaining_indeg GLOBAL PROPERTY "ARIEO_TOPO_INDEG_${h}")
                 get_property(deps GLOBAL PROPERTY "ARIEO_PKG_DEPS_${h}")
                 string(APPEND cycle_msg "    PACKAGE: ${path}  (unresolved in-degree: ${remaining_indeg})\n")
@@ -355,13 +371,20 @@ function(add_stage_packages package_links)
     endforeach()
 
     # output a yaml file with the list of packages and their resolved paths for this stage (for debugging/verification)
+    # Built in memory and written once instead of reopening the file per line
     set(output_yaml "${ARIEO_WORKSPACE_ROOT_DIR}/workspace_packages.yaml")
-    file(WRITE "${output_yaml}" "packages:\n")
-    foreach(path IN LISTS sorted_paths)
+    # level: packages sharing a level are independent and may build in parallel
+    set(yaml_content "packages:\n")
+    foreach(path h IN ZIP_LISTS sorted_paths sorted_hashes)
         string(REGEX REPLACE "^.*/([^/]+)$" "\\1" pkg_name "${path}")
-        file(APPEND "${output_yaml}" "  - name: ${pkg_name}\n")
-        file(APPEND "${output_yaml}" "    path: ${path}\n")
+        get_property(level GLOBAL PROPERTY "ARIEO_TOPO_LEVEL_${h}")
+        string(APPEND yaml_content
+            "  - name: ${pkg_name}\n"
+            "    path: ${path}\n"
+            "    level: ${level}\n"
+        )
     endforeach()
+    file(WRITE "${output_yaml}" "${yaml_content}")
 endfunction()
 
 function (parsing_pakage_link_string package_link out_type out_url out_local_path)
@@ -387,6 +410,22 @@ function (parsing_pakage_link_string package_link out_type out_url out_local_pat
     message(FATAL_ERROR "Invalid package link format: ${package_link}. Expected format: [REMOTE|LOCAL]: <git_url>@<branch_or_tag> => <local_path>")
 endfunction()
 
+function (split_package_url package_url out_base_url out_tag out_name)
+    # Split "https://.../Repo.git@tag" into base URL, tag and package name (Repo)
+    if(package_url MATCHES "^(.*)@([^@/]+)$")
+        set(_base_url "${CMAKE_MATCH_1}")
+        set(_tag "${CMAKE_MATCH_2}")
+    else()
+        set(_base_url "${package_url}")
+        set(_tag "")
+    endif()
+    string(REGEX MATCH "[^/]+$" _name "${_base_url}")
+    string(REGEX REPLACE "\\.git$" "" _name "${_name}")
+    set(${out_base_url} "${_base_url}" PARENT_SCOPE)
+    set(${out_tag} "${_tag}" PARENT_SCOPE)
+    set(${out_name} "${_name}" PARENT_SCOPE)
+endfunction()
+
 function (get_package_info cmake_dir out_depends_list)
     file(READ "${cmake_dir}/CMakeLists.txt" _cmake_content)
 
@@ -418,31 +457,143 @@ function (get_package_info cmake_dir out_depends_list)
     set(${out_depends_list} "${_depends_list}" PARENT_SCOPE)
 endfunction()
 
+function (sync_remote_packages package_urls local_dirs)
+    # Existing checkouts are updated one by one; fresh clones are independent
+    # network transfers, so they run in batches of ARIEO_PACKAGES_SYNC_JOBS.
+    # execute_process() starts all COMMANDs of one call concurrently.
+    set(ARIEO_PACKAGES_SYNC_JOBS 8 CACHE STRING "Maximum number of remote packages cloned concurrently")
+    set(sync_jobs ${ARIEO_PACKAGES_SYNC_JOBS})
+    if(NOT sync_jobs GREATER 0)
+        set(sync_jobs 1)
+    endif()
+    # OFF leaves existing checkouts untouched (e.g. while another build
+    # directory is compiling from them); missing packages are still cloned
+    set(ARIEO_PACKAGES_UPDATE ON CACHE BOOL "Update existing remote package checkouts during configure")
+
+    set(clone_urls "")
+    set(clone_dirs "")
+    foreach(package_url local_dir IN ZIP_LISTS package_urls local_dirs)
+        if(EXISTS ${local_dir})
+            if(ARIEO_PACKAGES_UPDATE)
+                sync_remote_package("${package_url}" "${local_dir}")
+            endif()
+        else()
+            list(APPEND clone_urls "${package_url}")
+            list(APPEND clone_dirs "${local_dir}")
+        endif()
+    endforeach()
+
+    list(LENGTH clone_urls clone_count)
+    set(batch_start 0)
+    while(batch_start LESS clone_count)
+        math(EXPR batch_end "${batch_start} + ${sync_jobs} - 1")
+        if(batch_end GREATER_EQUAL clone_count)
+            math(EXPR batch_end "${clone_count} - 1")
+        endif()
+
+        set(clone_commands "")
+        foreach(idx RANGE ${batch_start} ${batch_end})
+            list(GET clone_urls ${idx} package_url)
+            list(GET clone_dirs ${idx} local_dir)
+            split_package_url("${package_url}" git_url git_tag pkg_name)
+            if(NOT git_tag)
+                message(FATAL_ERROR "[arieo_workspace] sync_remote_packages: no @tag in URL '${package_url}'")
+            endif()
+            message(STATUS "[arieo_workspace] Cloning ${git_url} (branch: ${git_tag}) to ${local_dir}")
+            # --quiet: commands of one execute_process() are piped into each
+            # other, so keep stdout empty
+            list(APPEND clone_commands COMMAND git -c advice.detachedHead=false clone --quiet --branch ${git_tag} --depth 1 ${git_url} ${local_dir})
+        endforeach()
+
+        execute_process(${clone_commands} RESULTS_VARIABLE clone_results)
+
+        set(clone_errors "")
+        set(idx ${batch_start})
+        foreach(clone_result IN LISTS clone_results)
+            if(NOT clone_result EQUAL 0)
+                list(GET clone_urls ${idx} package_url)
+                list(GET clone_dirs ${idx} local_dir)
+                # --branch only accepts branches and tags; retry pinned commits
+                split_package_url("${package_url}" git_url git_tag pkg_name)
+                string(LENGTH "${git_tag}" tag_length)
+                if(tag_length EQUAL 40 AND git_tag MATCHES "^[0-9a-fA-F]+$")
+                    fetch_remote_package_commit("${git_url}" "${git_tag}" "${local_dir}" clone_result)
+                endif()
+            endif()
+            if(NOT clone_result EQUAL 0)
+                string(APPEND clone_errors "  ${package_url} -> ${local_dir} (${clone_result})\n")
+            endif()
+            math(EXPR idx "${idx} + 1")
+        endforeach()
+        if(clone_errors)
+            message(FATAL_ERROR "[arieo_workspace] git clone failed for:\n${clone_errors}")
+        endif()
+
+        math(EXPR batch_start "${batch_end} + 1")
+    endwhile()
+endfunction()
+
+function (fetch_remote_package_commit git_url git_commit local_dir out_result)
+    # Shallow checkout of a single commit: init + fetch --depth 1 <sha>
+    message(STATUS "[arieo_workspace] Fetching commit ${git_commit} of ${git_url} to ${local_dir}")
+    set(result 1)
+    execute_process(COMMAND git init --quiet ${local_dir} RESULT_VARIABLE result)
+    if(result EQUAL 0)
+        execute_process(COMMAND git -C ${local_dir} remote add origin ${git_url} RESULT_VARIABLE result)
+    endif()
+    if(result EQUAL 0)
+        execute_process(COMMAND git -C ${local_dir} fetch --quiet --depth 1 origin ${git_commit} RESULT_VARIABLE result)
+    endif()
+    if(result EQUAL 0)
+        execute_process(COMMAND git -C ${local_dir} -c advice.detachedHead=false checkout --quiet FETCH_HEAD RESULT_VARIABLE result)
+    endif()
+    if(NOT result EQUAL 0)
+        file(REMOVE_RECURSE ${local_dir})
+    endif()
+    set(${out_result} ${result} PARENT_SCOPE)
+endfunction()
+
 function (sync_remote_package package_url local_dir)
-    # Split "https://...Repo.git@tag" into git_url and branch
-    string(REGEX MATCH "@([^@/]+)$" tag_match "${package_url}")
-    set(git_tag "${CMAKE_MATCH_1}")
-    string(REGEX REPLACE "@[^@/]+$" "" git_url "${package_url}")
+    # Update an existing checkout; missing ones are cloned by sync_remote_packages()
+    split_package_url("${package_url}" git_url git_tag pkg_name)
 
     if(NOT git_tag)
         message(FATAL_ERROR "[arieo_workspace] sync_remote_package: no @tag in URL '${package_url}'")
     endif()
 
-    if(NOT EXISTS ${local_dir})
-        execute_process(
-            COMMAND git clone --branch ${git_tag} --depth 1 ${git_url} ${local_dir}
-            RESULT_VARIABLE clone_result
-        )
-        if(NOT clone_result EQUAL 0)
-            message(FATAL_ERROR "[arieo_workspace] git clone failed for ${git_url} (branch: ${git_tag}) to ${local_dir}")
-        endif()
-    else()
-        execute_process(
-            COMMAND git -C ${local_dir} pull
-            RESULT_VARIABLE pull_result
-        )
-        if(NOT pull_result EQUAL 0)
-            message(WARNING "[arieo_workspace] git pull failed for ${local_dir}")
+    # Tags and pinned commits leave HEAD detached; when HEAD already is the
+    # requested revision there is nothing to pull, so skip the network.
+    # One rev-parse prints: HEAD commit, tag commit, symbolic HEAD name
+    # ("HEAD" when detached).
+    execute_process(
+        COMMAND git -C ${local_dir} rev-parse HEAD "${git_tag}^{commit}" --symbolic-full-name HEAD
+        RESULT_VARIABLE rev_parse_result
+        OUTPUT_VARIABLE rev_parse_output
+        OUTPUT_STRIP_TRAILING_WHITESPACE
+        ERROR_QUIET
+    )
+    if(rev_parse_result EQUAL 0)
+        string(REPLACE "\n" ";" rev_parse_lines "${rev_parse_output}")
+        list(LENGTH rev_parse_lines rev_parse_count)
+        if(rev_parse_count EQUAL 3)
+            list(GET rev_parse_lines 0 head_commit)
+            list(GET rev_parse_lines 1 tag_commit)
+            list(GET rev_parse_lines 2 head_ref)
+            if(head_ref STREQUAL "HEAD" AND head_commit STREQUAL tag_commit)
+                message(STATUS "[arieo_workspace] ${local_dir} is at ${git_tag}, skipping pull")
+                return()
+            endif()
         endif()
     endif()
+
+    execute_process(
+        COMMAND git -C ${local_dir} pull --quiet
+        RESULT_VARIABLE pull_result
+        OUTPUT_QUIET
+        ERROR_VARIABLE pull_error
+        ERROR_STRIP_TRAILING_WHITESPACE
+    )
+    if(NOT pull_result EQUAL 0)
+        message(WARNING "[arieo_workspace] git pull failed for ${local_dir}:\n${pull_error}")
+    endif()
 endfunction()
\ No newline at end of file